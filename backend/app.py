@@ -1,15 +1,66 @@
 #!/usr/bin/env python3
 import os
-from flask import Flask, jsonify, request
-from database import get_conn
+import time
+from flask import Flask, Response, jsonify, request
+from database import get_conn, get_duck, release_conn
 from flask_cors import CORS
 
+try:
+    import orjson
+except ImportError:  # fall back to Flask's json encoder
+    orjson = None
+
+# Trips are read-mostly after a load, so dataset-wide aggregates can be reused
+# for a while instead of scanning the table on every request.
+SUMMARY_TTL_SEC = int(os.getenv("SUMMARY_TTL_SEC", 60))
+
+# Optional /api/trips filters. Every combination gets its SQL built once
+# below, so repeated requests send byte-identical text and hit the
+# connection's prepared-statement cache instead of re-parsing.
+TRIP_FILTERS = [
+    "pickup_datetime >= ?",
+    "pickup_datetime <= ?",
+    "trip_distance_km >= ?",
+    "trip_distance_km <= ?",
+    "pickup_hour IS NOT NULL AND pickup_hour BETWEEN 0 AND 23",
+    # Keyset cursor: seeks the pickup_datetime index instead of skipping OFFSET rows
+    "(pickup_datetime, id) < (?, ?)",
+]
+
+
+def _trips_sql(key):
+    where = [cond for bit, cond in enumerate(TRIP_FILTERS) if key & (1 << bit)]
+    where_sql = (" WHERE " + " AND ".join(where)) if where else ""
+    return f"""
+        SELECT id, pickup_datetime, dropoff_datetime,
+               pickup_lat / 1e6 AS pickup_lat, pickup_lon / 1e6 AS pickup_lon,
+               dropoff_lat / 1e6 AS dropoff_lat, dropoff_lon / 1e6 AS dropoff_lon,
+               trip_distance_km, trip_duration_sec,
+               fare_amount, tip_amount, passenger_count, payment_type,
+               avg_speed_kmh, fare_per_km, pickup_hour, weekday, is_weekend, haversine_km
+        FROM trips
+        {where_sql}
+        ORDER BY pickup_datetime DESC, id DESC
+        LIMIT ?
+    """
+
+
+TRIPS_SQL = {key: _trips_sql(key) for key in range(1 << len(TRIP_FILTERS))}
+
+
+def json_response(payload):
+    """Serialize large payloads with orjson when it is installed."""
+    if orjson is None:
+        return jsonify(payload)
+    return Response(orjson.dumps(payload), mimetype="application/json")
+
 
 def create_app():
     """Create and configure the Flask app."""
     app = Flask(__name__)
     # Allow browser-based frontends (served from file:// or other ports) to call this API.
     CORS(app)
+    summary_cache = {}
 
     @app.get("/health")
     def health():
@@ -19,86 +70,101 @@ def create_app():
     @app.get("/api/summary")
     def summary():
         """High-level dataset summary values."""
+        if summary_cache and time.monotonic() < summary_cache["expires"]:
+            return jsonify(summary_cache["value"])
+        conn = None
         try:
-            conn = get_conn()
-            cur = conn.cursor()
-            cur.execute("SELECT COUNT(*) FROM trips")
-            total = cur.fetchone()[0]
-            cur.execute("SELECT AVG(avg_speed_kmh) FROM trips WHERE avg_speed_kmh IS NOT NULL")
-            avg_speed = cur.fetchone()[0]
-            cur.execute("SELECT AVG(fare_per_km) FROM trips WHERE fare_per_km IS NOT NULL")
-            avg_fpkm = cur.fetchone()[0]
-            return jsonify({
+            # Prefer the columnar Parquet copy for full-table aggregates
+            cur = get_duck()
+            if cur is None:
+                conn = get_conn()
+                cur = conn.cursor()
+            # One scan for all three values; AVG already skips NULLs
+            cur.execute("SELECT COUNT(*), AVG(avg_speed_kmh), AVG(fare_per_km) FROM trips")
+            total, avg_speed, avg_fpkm = cur.fetchone()
+            value = {
                 "total_trips": int(total) if total is not None else 0,
                 "avg_speed_kmh": float(round(avg_speed, 3)) if avg_speed is not None else None,
                 "avg_fare_per_km": float(round(avg_fpkm, 3)) if avg_fpkm is not None else None,
-            })
+            }
+            summary_cache.update(value=value, expires=time.monotonic() + SUMMARY_TTL_SEC)
+            return jsonify(value)
         except Exception as e:
             return jsonify({"error": "database_unavailable", "detail": str(e)}), 503
         finally:
             try:
                 cur.close()
-                conn.close()
+                if conn is not None:
+                    release_conn(conn)
             except Exception:
                 pass
 
+    @app.post("/api/reload")
+    def reload():
+        """Drop cached aggregates; call after loading new data."""
+        summary_cache.clear()
+        return jsonify({"status": "ok"}), 200
+
     @app.get("/api/trips")
     def trips():
-        """Paginated list of trips with simple filters."""
+        """Paginated list of trips with simple filters.
+
+        Pages are keyset-based: pass the previous response's next_cursor
+        values as after_ts/after_id to get the following page.
+        """
         start = request.args.get("start")
         end = request.args.get("end")
         min_distance = request.args.get("min_distance", type=float)
         max_distance = request.args.get("max_distance", type=float)
         time_of_day = request.args.get("time_of_day")
-        page = request.args.get("page", default=1, type=int)
+        after_ts = request.args.get("after_ts")
+        after_id = request.args.get("after_id")
         per_page = request.args.get("per_page", default=100, type=int)
+        # Reject paging a client cannot have meant, or it would loop on page 1
+        if "page" in request.args:
+            return jsonify({"error": "bad_request", "detail": "page is not supported; pass next_cursor as after_ts/after_id"}), 400
+        if bool(after_ts) != bool(after_id):
+            return jsonify({"error": "bad_request", "detail": "after_ts and after_id must be given together"}), 400
+        if after_id:
+            try:
+                after_id = int(after_id)
+            except ValueError:
+                return jsonify({"error": "bad_request", "detail": "after_id must be an integer"}), 400
         per_page = max(1, min(per_page, 500))
-        offset = (page - 1) * per_page
 
-        where = []
+        # Each filter maps to one bit of the statement key, in TRIP_FILTERS order
+        filters = [
+            (bool(start), [start]),
+            (bool(end), [end]),
+            (min_distance is not None, [min_distance]),
+            (max_distance is not None, [max_distance]),
+            (bool(time_of_day), []),
+            (bool(after_ts), [after_ts, after_id]),
+        ]
+        key = 0
         params = []
-        if start:
-            where.append("pickup_datetime >= ?")
-            params.append(start)
-        if end:
-            where.append("pickup_datetime <= ?")
-            params.append(end)
-        if min_distance is not None:
-            where.append("trip_distance_km >= ?")
-            params.append(min_distance)
-        if max_distance is not None:
-            where.append("trip_distance_km <= ?")
-            params.append(max_distance)
-        if time_of_day:
-            where.append("pickup_hour IS NOT NULL AND pickup_hour BETWEEN 0 AND 23")
-
-        where_sql = (" WHERE " + " AND ".join(where)) if where else ""
-        sql = f"""
-            SELECT id, pickup_datetime, dropoff_datetime,
-                   pickup_lat, pickup_lon, dropoff_lat, dropoff_lon,
-                   trip_distance_km, trip_duration_sec,
-                   fare_amount, tip_amount, passenger_count, payment_type,
-                   avg_speed_kmh, fare_per_km, pickup_hour, weekday, is_weekend, haversine_km
-            FROM trips
-            {where_sql}
-            ORDER BY pickup_datetime DESC
-            LIMIT ? OFFSET ?
-        """
-        params.extend([per_page, offset])
+        for bit, (active, values) in enumerate(filters):
+            if active:
+                key |= 1 << bit
+                params.extend(values)
+        params.append(per_page)
+        sql = TRIPS_SQL[key]
 
         try:
             conn = get_conn()
             cur = conn.cursor()
-            cur.execute(sql, tuple(params))
-            cols = [d[0] for d in cur.description]
-            rows = [dict(zip(cols, r)) for r in cur.fetchall()]
-            return jsonify({"page": page, "per_page": per_page, "results": rows})
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            next_cursor = None
+            if len(rows) == per_page:
+                next_cursor = {"after_ts": rows[-1]["pickup_datetime"], "after_id": rows[-1]["id"]}
+            return json_response({"per_page": per_page, "next_cursor": next_cursor, "results": [dict(r) for r in rows]})
         except Exception as e:
             return jsonify({"error": "database_unavailable", "detail": str(e)}), 503
         finally:
             try:
                 cur.close()
-                conn.close()
+                release_conn(conn)
             except Exception:
                 pass
 
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+import sys
+
+import numpy as np
+
+import clean_transform as ct
+
+"""Check that the Numba kernel and the NumPy masks in clean_transform agree.
+
+They are two copies of the same rule chain; run this after changing either.
+Exits 1 on any difference, 0 when they match (or numba is not installed).
+"""
+
+NS = 1_000_000_000
+T0 = np.datetime64("2016-03-14T17:24:55", "ns").view("i8")
+
+
+def rule_rows():
+    """One row per exclusion reason, in REASON_LOG_FIELDS order, then a clean row."""
+    # plat, plon, dlat, dlon, pickup offset s, dropoff offset s, fare, tip, reported km
+    base = [40.76, -73.98, 40.75, -73.96, 0, 455, 8.5, 1.0, 1.9]
+    cases = [
+        {4: None},             # bad_timestamps (pickup missing)
+        {0: 41.5},             # bad_coordinates
+        {8: -3.0},             # bad_distance
+        {8: 0.0},              # zero_distance
+        {6: 700.0},            # bad_fare
+        {7: -1.0},             # bad_tip
+        {5: 0.5},              # nonpositive_duration (under a second)
+        {5: 30, 8: 9.0},       # implausible_speed
+        {},                    # clean
+        {8: np.nan},           # clean, distance from coordinates
+    ]
+    rows = []
+    for change in cases:
+        row = list(base)
+        for i, v in change.items():
+            row[i] = v
+        rows.append(row)
+    return rows
+
+
+def random_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = lambda: rng.uniform(40.4, 41.0, n)
+    lon = lambda: rng.uniform(-74.3, -73.6, n)
+    rows = np.column_stack([
+        lat(), lon(), lat(), lon(),
+        np.zeros(n), rng.uniform(-60, 7200, n),
+        rng.uniform(-10, 600, n), rng.uniform(-2, 20, n), rng.uniform(-1, 40, n),
+    ])
+    # Sprinkle in missing values everywhere
+    rows[rng.random(rows.shape) < 0.02] = np.nan
+    return rows.tolist()
+
+
+def to_arrays(rows):
+    cols = list(zip(*rows))
+    floats = [np.array(c, dtype="float64") for c in cols]
+    times = []
+    for c in cols[4:6]:
+        t = np.array([ct.NAT if v is None or v != v else T0 + int(v * NS) for v in c], dtype="int64")
+        times.append(t)
+    plat, plon, dlat, dlon = floats[:4]
+    fare, tip, reported_km = floats[6:9]
+    return plat, plon, dlat, dlon, times[0], times[1], fare, tip, reported_km
+
+
+def main():
+    if ct.clean_kernel is None:
+        print("numba not installed; only the NumPy path is in use")
+        return 0
+    rows = rule_rows() + random_rows(200_000)
+    args = to_arrays(rows)
+    failed = False
+    for exact in (False, True):
+        expected = ct.classify_np(*args, exact)
+        got = ct.classify(*args, exact)
+        reasons = ct.classify_np(*to_arrays(rule_rows()), exact)[0].tolist()
+        if reasons != list(range(1, len(ct.REASON_LOG_FIELDS) + 1)) + [0, 0]:
+            print(f"exact={exact}: rule rows classified as {reasons}")
+            failed = True
+        for name, a, b in zip(("reason", "distance", "speed", "haversine"), expected, got):
+            diff = ~((a == b) | (np.isnan(a) & np.isnan(b))) if a.dtype.kind == "f" else a != b
+            if diff.any():
+                print(f"exact={exact}: {name} differs in {int(diff.sum())} rows, first at {int(np.argmax(diff))}")
+                failed = True
+    print("FAILED" if failed else "OK: clean_kernel matches classify_np")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,32 @@
 #!/usr/bin/env python3
 import argparse
-import csv
+import io
 import json
 import math
+import mmap
+import multiprocessing
 import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
+try:
+    import numexpr as ne
+    ne.set_num_threads(os.cpu_count() or 1)
+except ImportError:  # fall back to plain NumPy
+    ne = None
+
+try:
+    from numba import njit, prange, set_num_threads
+except ImportError:  # fall back to the NumPy masks
+    njit = None
+
+DEG2RAD = 0.017453292519943295  # math.pi / 180
+
 NYC_LAT_MIN = 40.4774
 NYC_LAT_MAX = 40.9176
 NYC_LON_MIN = -74.2591
@@ -14,22 +35,86 @@ NYC_LON_MAX = -73.7004
 MAX_SPEED_KMPH = 120.0
 MAX_FARE = 500.0
 
-def parse_float(v):
-    try:
-        return float(v) if v not in (None, "", "\\N") else None
-    except Exception:
-        return None
+CHUNK_ROWS = 250_000
+SHARD_MIN_BYTES = 32 << 20  # smaller inputs are cleaned in-process
+DT_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Only blanks are missing: like the row-by-row version, "\N" does not fall
+# through to the next alias column; it just fails to parse as a number
+NA_VALUES = [""]
+LINE_END = "\r\n"  # csv.writer's default, as in data/processed
+# int() accepts these; "2.0" is not an integer passenger count
+INT_PATTERN = r"\s*[+-]?\d(?:_?\d){0,17}\s*"
+NAT = np.iinfo(np.int64).min  # datetime64 NaT viewed as int64
 
-def parse_int(v):
-    try:
-        return int(v) if v not in (None, "", "\\N") else None
-    except Exception:
-        return None
+# Evaluated in one fused pass by numexpr, without the NumPy temporaries
+HAVERSINE_EXPR = "2*6371.0*arcsin(sqrt(sin((lat2-lat1)*p/2)**2 + cos(lat1*p)*cos(lat2*p)*sin((lon2-lon1)*p/2)**2))"
+# Equirectangular approximation: one cos and one sqrt per row. Across the NYC
+# bbox it stays within ~1e-6 relative (about 1 cm) of the haversine; a single
+# precomputed cos for the bbox centre would be off by up to 0.2%.
+# equirect_np and clean_kernel evaluate it in the same operation order, so all
+# three paths give bit-identical distances.
+EQUIRECT_EXPR = "6371.0*sqrt(((lat2-lat1)*p)**2 + ((lon2-lon1)*p*cos((lat1+lat2)*p/2))**2)"
+
+# Raw column names accepted for each field, in order of preference
+FIELD_ALIASES = {
+    "pickup_ts": ["tpep_pickup_datetime", "pickup_datetime"],
+    "dropoff_ts": ["tpep_dropoff_datetime", "dropoff_datetime"],
+    "pickup_lat": ["pickup_latitude", "pickup_lat"],
+    "pickup_lon": ["pickup_longitude", "pickup_lon", "pickup_lng"],
+    "dropoff_lat": ["dropoff_latitude", "dropoff_lat"],
+    "dropoff_lon": ["dropoff_longitude", "dropoff_lon", "dropoff_lng"],
+    "distance": ["trip_distance", "distance", "trip_distance_km"],
+    "fare": ["fare_amount", "fare", "total_amount"],
+    "tip": ["tip_amount", "tip"],
+    "passenger_count": ["passenger_count", "passengers"],
+    "payment_type": ["payment_type", "payment"],
+}
+
+OUT_FIELDS = [
+    "pickup_datetime",
+    "dropoff_datetime",
+    "pickup_lat",
+    "pickup_lon",
+    "dropoff_lat",
+    "dropoff_lon",
+    "trip_distance_km",
+    "trip_duration_sec",
+    "fare_amount",
+    "tip_amount",
+    "passenger_count",
+    "payment_type",
+    "avg_speed_kmh",
+    "fare_per_km",
+    "pickup_hour",
+    "weekday",
+    "is_weekend",
+    "haversine_km",
+]
+
+LOG_FIELDS = ["line", "reason", "pickup_ts", "dropoff_ts", "pickup_lat", "pickup_lon", "dropoff_lat", "dropoff_lon", "distance", "fare"]
+
+# Exclusion reasons in the order the rules are checked (a row gets the first
+# one that applies), with the log columns recorded for each.
+REASON_LOG_FIELDS = {
+    "bad_timestamps": ["pickup_ts", "dropoff_ts"],
+    "bad_coordinates": ["pickup_lat", "pickup_lon", "dropoff_lat", "dropoff_lon"],
+    "bad_distance": ["distance"],
+    "zero_distance": ["distance"],
+    "bad_fare": ["fare"],
+    "bad_tip": ["fare"],
+    "nonpositive_duration": [],
+    "implausible_speed": ["distance"],
+}
 
 def parse_dt(s):
     if not s:
         return None
     s = s.replace("T", " ").replace("Z", "")
+    if len(s) == 19 and s[4] == "-" and s[7] == "-" and s[10] == " " and s[13] == ":" and s[16] == ":":
+        try:
+            return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]), int(s[11:13]), int(s[14:16]), int(s[17:19]))
+        except ValueError:
+            pass
     for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%m/%d/%Y %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f"):
         try:
             return datetime.strptime(s, fmt)
@@ -37,27 +122,304 @@ def parse_dt(s):
             pass
     return None
 
+def parse_dt_series(s):
+    # Pin the unit: pandas infers it per call, and fallback values may carry fractions of a second
+    dt = pd.to_datetime(s, format=DT_FORMAT, errors="coerce", cache=True).astype("datetime64[ns]")
+    # Only values that miss the common format go through the slower fallbacks
+    miss = dt.isna() & s.notna()
+    if miss.any():
+        dt[miss] = pd.to_datetime(s[miss].map(parse_dt))
+    return dt
+
 def in_bbox(lat, lon):
-    if lat is None or lon is None:
-        return False
-    return NYC_LAT_MIN <= lat <= NYC_LAT_MAX and NYC_LON_MIN <= lon <= NYC_LON_MAX
+    return (lat >= NYC_LAT_MIN) & (lat <= NYC_LAT_MAX) & (lon >= NYC_LON_MIN) & (lon <= NYC_LON_MAX)
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    if ne is not None:
+        return ne.evaluate(HAVERSINE_EXPR, local_dict={"lat1": lat1, "lon1": lon1, "lat2": lat2, "lon2": lon2, "p": DEG2RAD})
+    R = 6371.0
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(a))
+
+def equirect_np(lat1, lon1, lat2, lon2):
+    if ne is not None:
+        return ne.evaluate(EQUIRECT_EXPR, local_dict={"lat1": lat1, "lon1": lon1, "lat2": lat2, "lon2": lon2, "p": DEG2RAD})
+    R = 6371.0
+    dlat = (lat2 - lat1) * DEG2RAD
+    dlon = (lon2 - lon1) * DEG2RAD * np.cos((lat1 + lat2) * DEG2RAD / 2)
+    return R * np.sqrt(dlat ** 2 + dlon ** 2)
+
+def classify_np(plat, plon, dlat, dlon, p_ns, d_ns, fare, tip, reported_km, exact):
+    # Some datasets don't provide trip_distance; compute from haversine as fallback
+    hv_km = (haversine_np if exact else equirect_np)(plat, plon, dlat, dlon)
+    dist_km = np.where(np.isnan(reported_km), hv_km, reported_km)
+
+    bad_ts = (p_ns == NAT) | (d_ns == NAT) | (d_ns <= p_ns)
+    duration_sec = np.where(bad_ts, np.nan, (d_ns - p_ns) // 1_000_000_000)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_speed_kmh = dist_km / (duration_sec / 3600.0)
+
+    # NaN comparisons are False, so missing fares/tips pass their range checks
+    masks = [
+        bad_ts,
+        ~(in_bbox(plat, plon) & in_bbox(dlat, dlon)),
+        np.isnan(dist_km) | (dist_km < 0),
+        dist_km == 0,
+        (fare < 0) | (fare > MAX_FARE),
+        tip < 0,
+        duration_sec <= 0,
+        avg_speed_kmh > MAX_SPEED_KMPH,
+    ]
+    reason_code = np.select(masks, np.arange(1, len(masks) + 1), 0).astype(np.int8)
+    return reason_code, dist_km, avg_speed_kmh, hv_km
+
+if njit is not None:
+    # No fast-math: results must match classify_np bit for bit (see check_kernel.py),
+    # and the NaN checks for missing values must survive
+    # error_model="numpy": x/0 gives inf/NaN like the NumPy path instead of raising
+    @njit(parallel=True, cache=True, error_model="numpy")
+    def clean_kernel(plat, plon, dlat, dlon, pt_ns, dt_ns, fare, tip, reported_km, exact,
+                     reason_out, dist_km_out, speed_out, hv_out):
+        p = DEG2RAD
+        for i in prange(plat.shape[0]):
+            if exact:
+                a = (math.sin((dlat[i] - plat[i]) * p / 2) ** 2
+                     + math.cos(plat[i] * p) * math.cos(dlat[i] * p) * math.sin((dlon[i] - plon[i]) * p / 2) ** 2)
+                hv = 2 * 6371.0 * math.asin(math.sqrt(a))
+            else:
+                x = (dlon[i] - plon[i]) * p * math.cos((plat[i] + dlat[i]) * p / 2)
+                y = (dlat[i] - plat[i]) * p
+                hv = 6371.0 * math.sqrt(x * x + y * y)
+            dist = hv if math.isnan(reported_km[i]) else reported_km[i]
+            bad_ts = pt_ns[i] == NAT or dt_ns[i] == NAT or dt_ns[i] <= pt_ns[i]
+            duration = (dt_ns[i] - pt_ns[i]) // 1_000_000_000
+            speed = math.nan if bad_ts else dist / (duration / 3600.0)
+
+            if bad_ts:
+                reason = 1
+            elif not (NYC_LAT_MIN <= plat[i] <= NYC_LAT_MAX and NYC_LON_MIN <= plon[i] <= NYC_LON_MAX
+                      and NYC_LAT_MIN <= dlat[i] <= NYC_LAT_MAX and NYC_LON_MIN <= dlon[i] <= NYC_LON_MAX):
+                reason = 2
+            elif math.isnan(dist) or dist < 0:
+                reason = 3
+            elif dist == 0:
+                reason = 4
+            elif fare[i] < 0 or fare[i] > MAX_FARE:
+                reason = 5
+            elif tip[i] < 0:
+                reason = 6
+            elif duration <= 0:
+                reason = 7
+            elif speed > MAX_SPEED_KMPH:
+                reason = 8
+            else:
+                reason = 0
+
+            reason_out[i] = reason
+            dist_km_out[i] = dist
+            speed_out[i] = speed
+            hv_out[i] = hv
+else:
+    clean_kernel = None
+
+def classify(plat, plon, dlat, dlon, p_ns, d_ns, fare, tip, reported_km, exact=False):
+    """Per-row reason code (0 = keep, else 1-based index into REASON_LOG_FIELDS)
+    plus distance, average speed and haversine distance (equirectangular
+    approximation unless `exact`)."""
+    if clean_kernel is None:
+        return classify_np(plat, plon, dlat, dlon, p_ns, d_ns, fare, tip, reported_km, exact)
+    n = plat.shape[0]
+    reason_code = np.empty(n, dtype=np.int8)
+    dist_km, avg_speed_kmh, hv_km = np.empty(n), np.empty(n), np.empty(n)
+    clean_kernel(plat, plon, dlat, dlon, p_ns, d_ns, fare, tip, reported_km, exact,
+                 reason_code, dist_km, avg_speed_kmh, hv_km)
+    return reason_code, dist_km, avg_speed_kmh, hv_km
+
+def get_column(chunk, names):
+    """First non-empty value across the raw columns in `names`, row by row."""
+    if not names:
+        return pd.Series(np.nan, index=chunk.index, dtype=object)
+    col = chunk[names[0]]
+    for n in names[1:]:
+        col = col.fillna(chunk[n])
+    return col
+
+def py_round(x, ndigits):
+    """np.round(x, ndigits), but matching Python's round() on ties.
+
+    np.round scales, rounds and unscales, so values that sit on a decimal tie
+    (2.675 -> 2.67 in Python, 2.68 in NumPy) can differ. Only those few, and
+    magnitudes too large to scale exactly, are redone with round().
+    """
+    r = np.round(x, ndigits)
+    scaled = np.abs(x) * 10.0 ** ndigits
+    with np.errstate(invalid="ignore"):  # inf - inf
+        near_tie = (np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6) | (scaled >= 2.0 ** 52)
+    idx = np.flatnonzero(near_tie)
+    if idx.size:
+        r[idx] = [round(v, ndigits) for v in x[idx].tolist()]
+    return r
 
-def haversine_km(lat1, lon1, lat2, lon2):
+def to_float(col):
+    # astype parses exactly; to_numeric is only needed to coerce junk values
     try:
-        R = 6371.0
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        return R * c
-    except Exception:
-        return None
+        return col.astype("float64").to_numpy()
+    except (TypeError, ValueError):
+        return pd.to_numeric(col, errors="coerce").to_numpy(dtype="float64")
 
-def get_field(row, names):
-    for n in names:
-        if n in row and row[n] not in (None, ""):
-            return row[n]
-    return None
+def clean_chunk(chunk, columns, first_line, distance_unit, exact=False):
+    """Validate one chunk of raw rows; return (cleaned, exclusion log, counts)."""
+    raw = {k: get_column(chunk, names) for k, names in columns.items()}
+    num = {k: to_float(raw[k]) for k in ("pickup_lat", "pickup_lon", "dropoff_lat", "dropoff_lon", "distance", "fare", "tip")}
+    plat, plon, dlat, dlon = num["pickup_lat"], num["pickup_lon"], num["dropoff_lat"], num["dropoff_lon"]
+    fare, tip = num["fare"], num["tip"]
+
+    p_dt = parse_dt_series(raw["pickup_ts"])
+    d_dt = parse_dt_series(raw["dropoff_ts"])
+    p_ns = p_dt.to_numpy(dtype="datetime64[ns]").view("i8")
+    d_ns = d_dt.to_numpy(dtype="datetime64[ns]").view("i8")
+    reported_km = num["distance"] * 1.60934 if distance_unit == "miles" else num["distance"]
+
+    reason_code, dist_km, avg_speed_kmh, hv_km = classify(plat, plon, dlat, dlon, p_ns, d_ns, fare, tip, reported_km, exact)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fare_per_km = fare / dist_km
+    # Only meaningful for rows that passed the timestamp check
+    duration_sec = (d_ns - p_ns) // 1_000_000_000
+
+    reasons = list(REASON_LOG_FIELDS)
+    reason = np.array([""] + reasons, dtype=object)[reason_code]
+    keep = reason_code == 0
+    counts = dict(zip(reasons, np.bincount(reason_code, minlength=len(reasons) + 1)[1:].tolist()))
+
+    k = keep
+    pu = p_dt[k]
+    pc_raw = raw["passenger_count"][k]
+    is_int = pc_raw.str.fullmatch(INT_PATTERN).fillna(False).to_numpy(dtype=bool)
+    passengers = np.zeros(len(pc_raw), dtype=np.int64)
+    passengers[is_int] = pc_raw[is_int].str.replace("_", "", regex=False).astype(np.int64)
+    weekday = pu.dt.weekday.to_numpy()
+    cleaned = pd.DataFrame({
+        "pickup_datetime": pu.dt.strftime(DT_FORMAT).to_numpy(),
+        "dropoff_datetime": d_dt[k].dt.strftime(DT_FORMAT).to_numpy(),
+        "pickup_lat": py_round(plat[k], 6),
+        "pickup_lon": py_round(plon[k], 6),
+        "dropoff_lat": py_round(dlat[k], 6),
+        "dropoff_lon": py_round(dlon[k], 6),
+        "trip_distance_km": py_round(dist_km[k], 6),
+        "trip_duration_sec": duration_sec[k],
+        "fare_amount": py_round(fare[k], 2),
+        "tip_amount": py_round(np.nan_to_num(tip[k], nan=0.0), 2),
+        "passenger_count": np.where(passengers != 0, passengers, 1),
+        "payment_type": raw["payment_type"][k].to_numpy(),
+        "avg_speed_kmh": py_round(avg_speed_kmh[k], 3),
+        "fare_per_km": py_round(fare_per_km[k], 3),
+        "pickup_hour": pu.dt.hour.to_numpy(),
+        "weekday": weekday,
+        "is_weekend": (weekday >= 5).astype(np.int64),
+        "haversine_km": py_round(hv_km[k], 3),
+    }, columns=OUT_FIELDS)
+
+    x = ~keep
+    log_values = {
+        "pickup_ts": raw["pickup_ts"].to_numpy(dtype=object),
+        "dropoff_ts": raw["dropoff_ts"].to_numpy(dtype=object),
+        "pickup_lat": plat,
+        "pickup_lon": plon,
+        "dropoff_lat": dlat,
+        "dropoff_lon": dlon,
+        "distance": dist_km,
+        "fare": fare,
+    }
+    log = pd.DataFrame({
+        "line": np.arange(first_line, first_line + len(chunk))[x],
+        "reason": reason[x],
+    })
+    for field, values in log_values.items():
+        logged = np.isin(log["reason"], [r for r, fields in REASON_LOG_FIELDS.items() if field in fields])
+        log[field] = pd.Series(values[x], dtype=values.dtype).where(logged)
+    return cleaned, log, counts
+
+class ByteRange(io.RawIOBase):
+    """Read-only view of bytes [start, end) of a file."""
+
+    def __init__(self, path, start, end):
+        self.f = open(path, "rb")
+        self.f.seek(start)
+        self.left = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self.f.readinto(memoryview(b)[:min(len(b), self.left)])
+        self.left -= n
+        return n
+
+    def close(self):
+        self.f.close()
+        super().close()
+
+def has_quotes(path):
+    """True if the file contains a double quote anywhere.
+
+    Quoted fields may hide newlines, which would break the byte-range split;
+    a file without a single quote character cannot have them.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm.find(b'"') != -1
+
+def shard_ranges(path, n):
+    """Split the data rows of `path` into up to n byte ranges that start on a line."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = len(f.readline())
+        bounds = [start]
+        for i in range(1, n):
+            f.seek(start + (size - start) * i // n)
+            f.readline()
+            pos = min(f.tell(), size)
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    if size > bounds[-1]:
+        bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+def clean_rows(chunks, columns, fout, flog, distance_unit, exact=False):
+    """Clean an iterable of raw chunks into fout/flog; return (total, cleaned, excluded)."""
+    total = cleaned = 0
+    excluded = {}
+    for chunk in chunks:
+        out, log, counts = clean_chunk(chunk, columns, total + 1, distance_unit, exact)
+        out.to_csv(fout, header=False, index=False, lineterminator=LINE_END)
+        log.to_csv(flog, header=False, index=False, lineterminator=LINE_END)
+
+        total += len(chunk)
+        cleaned += len(out)
+        for r, c in counts.items():
+            if c:
+                excluded[r] = excluded.get(r, 0) + c
+    return total, cleaned, excluded
+
+def read_chunks(source, **kwargs):
+    return pd.read_csv(source, chunksize=CHUNK_ROWS, dtype=str, keep_default_na=False,
+                       na_values=NA_VALUES, encoding="utf-8", **kwargs)
+
+def init_worker():
+    # One core per process; the shards already keep every core busy
+    if ne is not None:
+        ne.set_num_threads(1)
+    if njit is not None:
+        set_num_threads(1)
+
+def clean_shard(path, start, end, names, usecols, columns, out_path, log_path, distance_unit, exact):
+    """Worker: clean one byte range into its own output and log files."""
+    with io.BufferedReader(ByteRange(path, start, end)) as fin, \
+         open(out_path, "w", newline="", encoding="utf-8") as fout, \
+         open(log_path, "w", newline="", encoding="utf-8") as flog:
+        chunks = read_chunks(fin, header=None, names=names, usecols=usecols)
+        return clean_rows(chunks, columns, fout, flog, distance_unit, exact)
 
 def main():
     p = argparse.ArgumentParser()
@@ -66,150 +428,62 @@ def main():
     p.add_argument("--log", required=True, help="exclusions log (CSV)")
     p.add_argument("--stats", required=False, help="summary JSON path")
     p.add_argument("--distance-unit", choices=["miles", "km"], default="miles")
+    p.add_argument("--exact-haversine", action="store_true", help="full haversine instead of the equirectangular approximation")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                   help="processes for large inputs (default: all cores); files containing quoted fields are cleaned in one process")
     args = p.parse_args()
 
     os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
     os.makedirs(os.path.dirname(args.log) or ".", exist_ok=True)
 
-    out_fields = [
-        "pickup_datetime",
-        "dropoff_datetime",
-        "pickup_lat",
-        "pickup_lon",
-        "dropoff_lat",
-        "dropoff_lon",
-        "trip_distance_km",
-        "trip_duration_sec",
-        "fare_amount",
-        "tip_amount",
-        "passenger_count",
-        "payment_type",
-        "avg_speed_kmh",
-        "fare_per_km",
-        "pickup_hour",
-        "weekday",
-        "is_weekend",
-        "haversine_km",
-    ]
+    names = list(pd.read_csv(args.input, nrows=0).columns)
+    columns = {k: [n for n in aliases if n in names] for k, aliases in FIELD_ALIASES.items()}
+    usecols = sorted({n for aliases in columns.values() for n in aliases})
 
-    total = cleaned = 0
-    excluded = {}
+    workers = max(1, min(args.workers, os.path.getsize(args.input) // SHARD_MIN_BYTES))
+    shards = shard_ranges(args.input, workers) if workers > 1 and not has_quotes(args.input) else []
 
-    with open(args.input, newline="", encoding="utf-8") as fin, \
-         open(args.output, "w", newline="", encoding="utf-8") as fout, \
+    with open(args.output, "w", newline="", encoding="utf-8") as fout, \
          open(args.log, "w", newline="", encoding="utf-8") as flog:
 
-        reader = csv.DictReader(fin)
-        w = csv.DictWriter(fout, fieldnames=out_fields)
-        w.writeheader()
-        logw = csv.DictWriter(flog, fieldnames=["line", "reason", "pickup_ts", "dropoff_ts", "pickup_lat", "pickup_lon", "dropoff_lat", "dropoff_lon", "distance", "fare"])
-        logw.writeheader()
-
-        for i, row in enumerate(reader, start=1):
-            total += 1
-
-            p_ts = get_field(row, ["tpep_pickup_datetime", "pickup_datetime"]) or None
-            d_ts = get_field(row, ["tpep_dropoff_datetime", "dropoff_datetime"]) or None
-            p_dt = parse_dt(p_ts)
-            d_dt = parse_dt(d_ts)
-            if not p_dt or not d_dt or d_dt <= p_dt:
-                r = "bad_timestamps"
-                excluded[r] = excluded.get(r, 0) + 1
-                logw.writerow({"line": i, "reason": r, "pickup_ts": p_ts, "dropoff_ts": d_ts})
-                continue
-
-            plat = parse_float(get_field(row, ["pickup_latitude", "pickup_lat"]))
-            plon = parse_float(get_field(row, ["pickup_longitude", "pickup_lon", "pickup_lng"]))
-            dlat = parse_float(get_field(row, ["dropoff_latitude", "dropoff_lat"]))
-            dlon = parse_float(get_field(row, ["dropoff_longitude", "dropoff_lon", "dropoff_lng"]))
-            if not in_bbox(plat, plon) or not in_bbox(dlat, dlon):
-                r = "bad_coordinates"
-                excluded[r] = excluded.get(r, 0) + 1
-                logw.writerow({"line": i, "reason": r, "pickup_lat": plat, "pickup_lon": plon, "dropoff_lat": dlat, "dropoff_lon": dlon})
-                continue
-
-            # Some datasets don't provide trip_distance; compute from haversine as fallback
-            reported_dist = parse_float(get_field(row, ["trip_distance", "distance", "trip_distance_km"]))
-            hv_km_pre = haversine_km(plat, plon, dlat, dlon)
-            if reported_dist is not None:
-                dist_km = reported_dist * 1.60934 if args.distance_unit == "miles" else reported_dist
-            else:
-                dist_km = hv_km_pre  # fallback to haversine distance when trip_distance missing
-            if dist_km is None or dist_km < 0:
-                r = "bad_distance"
-                excluded[r] = excluded.get(r, 0) + 1
-                logw.writerow({"line": i, "reason": r, "distance": dist_km})
-                continue
-            if dist_km == 0:
-                r = "zero_distance"
-                excluded[r] = excluded.get(r, 0) + 1
-                logw.writerow({"line": i, "reason": r, "distance": dist_km})
-                continue
-
-            # Fares may be missing in this dataset; allow NULL fares and tips
-            fare = parse_float(get_field(row, ["fare_amount", "fare", "total_amount"]))
-            tip = parse_float(get_field(row, ["tip_amount", "tip"]))
-            if fare is not None and (fare < 0 or fare > MAX_FARE):
-                r = "bad_fare"
-                excluded[r] = excluded.get(r, 0) + 1
-                logw.writerow({"line": i, "reason": r, "fare": fare})
-                continue
-            if tip is not None and tip < 0:
-                r = "bad_tip"
-                excluded[r] = excluded.get(r, 0) + 1
-                logw.writerow({"line": i, "reason": r, "fare": fare})
-                continue
-
-            duration_sec = int((d_dt - p_dt).total_seconds())
-            if duration_sec <= 0:
-                r = "nonpositive_duration"
-                excluded[r] = excluded.get(r, 0) + 1
-                logw.writerow({"line": i, "reason": r})
-                continue
-
-            hours = duration_sec / 3600.0
-            avg_speed_kmh = dist_km / hours if hours > 0 else 0.0
-            if avg_speed_kmh > MAX_SPEED_KMPH:
-                r = "implausible_speed"
-                excluded[r] = excluded.get(r, 0) + 1
-                logw.writerow({"line": i, "reason": r, "distance": dist_km})
-                continue
-
-            fare_per_km = (fare / dist_km) if (fare is not None and dist_km > 0) else None
-            pickup_hour = p_dt.hour
-            weekday = p_dt.weekday()
-            is_weekend = 1 if weekday >= 5 else 0
-            hv_km = hv_km_pre
-
-            out = {
-                "pickup_datetime": p_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                "dropoff_datetime": d_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                "pickup_lat": round(plat, 6) if plat is not None else None,
-                "pickup_lon": round(plon, 6) if plon is not None else None,
-                "dropoff_lat": round(dlat, 6) if dlat is not None else None,
-                "dropoff_lon": round(dlon, 6) if dlon is not None else None,
-                "trip_distance_km": round(dist_km, 6),
-                "trip_duration_sec": duration_sec,
-                "fare_amount": round(fare, 2) if fare is not None else None,
-                "tip_amount": round(tip, 2) if tip is not None else 0.0,
-                "passenger_count": parse_int(get_field(row, ["passenger_count", "passengers"])) or 1,
-                "payment_type": get_field(row, ["payment_type", "payment"]),
-                "avg_speed_kmh": round(avg_speed_kmh, 3),
-                "fare_per_km": round(fare_per_km, 3) if fare_per_km is not None else None,
-                "pickup_hour": pickup_hour,
-                "weekday": weekday,
-                "is_weekend": is_weekend,
-                "haversine_km": round(hv_km, 3) if hv_km is not None else None,
-            }
-
-            w.writerow(out)
-            cleaned += 1
+        fout.write(",".join(OUT_FIELDS) + LINE_END)
+        flog.write(",".join(LOG_FIELDS) + LINE_END)
+
+        if len(shards) <= 1:
+            chunks = read_chunks(args.input, usecols=usecols)
+            total, cleaned, excluded = clean_rows(chunks, columns, fout, flog, args.distance_unit, args.exact_haversine)
+        else:
+            total = cleaned = 0
+            excluded = {}
+            # fork shares the already-imported modules with the workers
+            ctx = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+            with tempfile.TemporaryDirectory(dir=os.path.dirname(args.output) or ".") as tmp, \
+                 ProcessPoolExecutor(len(shards), mp_context=ctx, initializer=init_worker) as pool:
+                parts = [(os.path.join(tmp, f"{i}.csv"), os.path.join(tmp, f"{i}.log.csv")) for i in range(len(shards))]
+                futures = [pool.submit(clean_shard, args.input, start, end, names, usecols, columns,
+                                       out_path, log_path, args.distance_unit, args.exact_haversine)
+                           for (start, end), (out_path, log_path) in zip(shards, parts)]
+                # Stitch shards back together in input order
+                for future, (out_path, log_path) in zip(futures, parts):
+                    rows, kept, counts = future.result()
+                    with open(out_path, newline="", encoding="utf-8") as f:
+                        shutil.copyfileobj(f, fout)
+                    # Shard logs number lines from 1; shift them by the rows before the shard
+                    with open(log_path, newline="", encoding="utf-8") as f:
+                        for line in f:
+                            n, rest = line.split(",", 1)
+                            flog.write(f"{int(n) + total},{rest}")
+
+                    total += rows
+                    cleaned += kept
+                    for r, c in counts.items():
+                        excluded[r] = excluded.get(r, 0) + c
 
     summary = {
         "total_rows": total,
         "cleaned_rows": cleaned,
         "excluded_rows": total - cleaned,
-        "excluded_counts": excluded,
+        "excluded_counts": {r: excluded[r] for r in REASON_LOG_FIELDS if r in excluded},
     }
     if args.stats:
         with open(args.stats, "w", encoding="utf-8") as sf:
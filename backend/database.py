@@ -1,10 +1,100 @@
 import os
+import queue
 import sqlite3
+import threading
+
+try:
+    import duckdb
+    import pyarrow.parquet as pq
+except ImportError:  # analytical reads fall back to SQLite
+    duckdb = None
 
 """Module for interacting with the NYC Taxi database."""
 
+# WAL lets API readers run alongside a load; NORMAL sync is safe under WAL.
+# Page cache (256 MiB) and mmap (256 MiB) keep hot table pages out of syscalls.
+CONN_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-262144;
+PRAGMA mmap_size=268435456;
+"""
+
+# Idle connections, reused across requests. The threaded dev server starts a
+# thread per request, so a thread-local connection would never be reused;
+# instead each connection is borrowed by one request at a time. Each one can
+# hold a 256 MiB page cache, so at most POOL_SIZE are kept; extras are closed.
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", 4))
+_pool = queue.Queue(maxsize=POOL_SIZE)
+
+def _db_path():
+    return os.getenv("SQLITE_PATH", os.path.join(os.path.dirname(__file__), "nyc_taxi.db"))
+
 def get_conn():
-    """Return a SQLite connection using SQLITE_PATH or default DB file."""
-    db_path = os.getenv("SQLITE_PATH", os.path.join(os.path.dirname(__file__), "nyc_taxi.db"))
-    conn = sqlite3.connect(db_path)
+    """Return a SQLite connection using SQLITE_PATH or default DB file.
+
+    Connections come from a pool; hand them back with release_conn().
+    """
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        pass
+    conn = sqlite3.connect(_db_path(), check_same_thread=False)
+    conn.executescript(CONN_PRAGMAS)
+    conn.row_factory = sqlite3.Row
     return conn
+
+def release_conn(conn):
+    """Return a connection from get_conn() to the pool, or close it if the pool is full."""
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+_duck = None
+_duck_lock = threading.Lock()
+# Dedicated connection for the staleness check: PRAGMA data_version only
+# changes when *other* connections commit, so it must not be shared
+_stamp_conn = None
+_fresh_key = None  # (parquet mtime, data_version) last seen to match
+
+def _export_is_current(parquet_path):
+    """True when the Parquet export's stamp matches the trips table.
+
+    load_data.py stamps the export with the table's row count and max id;
+    ids are AUTOINCREMENT, so any load, insert or delete changes the stamp.
+    """
+    global _stamp_conn, _fresh_key
+    if _stamp_conn is None:
+        _stamp_conn = sqlite3.connect(_db_path(), check_same_thread=False)
+    key = (os.path.getmtime(parquet_path), _stamp_conn.execute("PRAGMA data_version").fetchone()[0])
+    if key == _fresh_key:
+        return True
+    stamp = pq.read_schema(parquet_path).metadata or {}
+    rows, max_id = _stamp_conn.execute("SELECT COUNT(*), MAX(id) FROM trips").fetchone()
+    current = stamp.get(b"sqlite_rows") == str(rows).encode() and stamp.get(b"sqlite_max_id") == str(max_id).encode()
+    _fresh_key = key if current else None
+    return current
+
+def get_duck():
+    """Return a DuckDB cursor with a `trips` view over the Parquet export.
+
+    Returns None when duckdb is not installed, load_data.py has not written
+    the export yet, or the database changed after the export; callers then
+    query SQLite instead.
+    """
+    global _duck
+    parquet_path = os.getenv("PARQUET_PATH", os.path.join(os.path.dirname(__file__), "trips.parquet"))
+    if duckdb is None or not os.path.exists(parquet_path):
+        return None
+    with _duck_lock:
+        if not _export_is_current(parquet_path):
+            return None
+        if _duck is None:
+            conn = duckdb.connect()
+            conn.execute("CREATE VIEW trips AS SELECT * FROM read_parquet('{}')".format(parquet_path.replace("'", "''")))
+            _duck = conn
+    return _duck.cursor()
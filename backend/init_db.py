@@ -18,6 +18,8 @@ def apply_schema():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     with sqlite3.connect(DB_PATH) as conn:
         conn.executescript(sql)
+        # Persistent: later connections open the file in WAL mode too
+        conn.execute("PRAGMA journal_mode=WAL")
     print(f"Applied schema from {SCHEMA_PATH} to {DB_PATH}")
 
 
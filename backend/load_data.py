@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import itertools
 import os
+import shutil
+import subprocess
 import sys
 from typing import List
 
 import sqlite3
 
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
 EXPECTED_COLUMNS: List[str] = [
     "pickup_datetime",
     "dropoff_datetime",
@@ -28,6 +36,38 @@ EXPECTED_COLUMNS: List[str] = [
     "haversine_km",
 ]
 
+# Rows per multi-row INSERT; 50 x 18 columns stays under SQLite's default
+# limit of 999 bound parameters per statement.
+BATCH_ROWS = 50
+CSV_BLOCK_SIZE = 8 << 20  # bytes of CSV parsed per Arrow batch
+
+# Coordinates are stored in SQLite as integer micro-degrees (see schema.sql)
+COORD_COLS = {"pickup_lat","pickup_lon","dropoff_lat","dropoff_lon"}
+COORD_SCALE = 1_000_000
+NUM_COLS_FLOAT = {"trip_distance_km","fare_amount","tip_amount","avg_speed_kmh","fare_per_km","haversine_km"}
+NUM_COLS_INT = {"trip_duration_sec","passenger_count","pickup_hour","weekday","is_weekend"}
+
+# Parquet copy of the table for columnar scans (read by database.get_duck).
+# Coordinates and derived distances/speeds fit in float32 (~7 significant
+# digits), which halves the bytes a scan has to read.
+PARQUET_ROW_GROUP = 262144
+PARQUET_FLOAT32 = COORD_COLS | {"trip_distance_km","avg_speed_kmh","fare_per_km","haversine_km"}
+PARQUET_SCHEMA = pa.schema(
+    [("id", pa.int64())]
+    + [
+        (c, pa.float32() if c in PARQUET_FLOAT32 else pa.float64() if c in NUM_COLS_FLOAT else pa.int64() if c in NUM_COLS_INT else pa.string())
+        for c in EXPECTED_COLUMNS
+    ]
+)
+
+LOAD_PRAGMAS = "PRAGMA temp_store=MEMORY; PRAGMA cache_size=-262144;"
+# SQLITE_UNSAFE_LOAD=1 skips fsyncs and keeps the rollback journal in memory.
+# Much faster, but a crash mid-load can leave the database file corrupt.
+UNSAFE_LOAD_PRAGMAS = "PRAGMA journal_mode=MEMORY; PRAGMA synchronous=OFF;"
+# WAL (set by init_db) is persistent and leaving it needs exclusive access,
+# so a WAL database stays in WAL and only skips the fsyncs
+UNSAFE_WAL_LOAD_PRAGMAS = "PRAGMA synchronous=OFF;"
+
 
 def parse_args():
     p = argparse.ArgumentParser(description="Load cleaned NYC taxi CSV into SQLite trips table")
@@ -36,6 +76,9 @@ def parse_args():
     p.add_argument("--table", default="trips", help="Target table (default: trips)")
     p.add_argument("--truncate", action="store_true", help="Truncate table before load")
     p.add_argument("--skip-header-check", action="store_true", help="Skip CSV header validation")
+    p.add_argument("--parquet", default=os.getenv("PARQUET_PATH", os.path.join(os.path.dirname(__file__), "trips.parquet")), help="Parquet export of the loaded table (default: backend/trips.parquet)")
+    p.add_argument("--no-parquet", action="store_true", help="Skip the Parquet export and remove any existing one")
+    p.add_argument("--fast-import", action="store_true", help="Bulk load with the sqlite3 shell's .import instead of Python inserts")
     return p.parse_args()
 
 
@@ -61,6 +104,184 @@ def validate_header(found: List[str], expected: List[str]):
         )
 
 
+def to_float(arr):
+    """Cast a string column to float64; cells float() rejects become NULL, as before."""
+    try:
+        return arr.cast(pa.float64())
+    except pa.ArrowInvalid:
+        values = []
+        for v in arr.to_pylist():
+            try:
+                values.append(None if v is None else float(v))
+            except ValueError:
+                values.append(None)
+        return pa.array(values, type=pa.float64())
+
+
+def iter_rows(csv_path: str):
+    """Yield each CSV row as a typed tuple in EXPECTED_COLUMNS order; blanks become NULL.
+
+    Arrow parses and converts the columns in C, one block at a time.
+    """
+    reader = pacsv.open_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=EXPECTED_COLUMNS,
+            include_missing_columns=True,
+            # Everything is read as text and converted below, so a bad cell
+            # becomes NULL instead of failing the load
+            column_types={c: pa.string() for c in EXPECTED_COLUMNS},
+            null_values=[],
+        ),
+    )
+    for batch in reader:
+        columns = []
+        for col, arr in zip(EXPECTED_COLUMNS, batch.columns):
+            arr = pc.utf8_trim_whitespace(arr)
+            arr = pc.if_else(pc.equal(arr, ""), pa.scalar(None, pa.string()), arr)
+            if col in COORD_COLS | NUM_COLS_FLOAT | NUM_COLS_INT:
+                arr = to_float(arr)
+            if col in COORD_COLS or col in NUM_COLS_INT:
+                # NaN/inf fit no INTEGER column
+                arr = pc.if_else(pc.is_finite(arr), arr, pa.scalar(None, pa.float64()))
+            if col in COORD_COLS:
+                # Ties away from zero, like SQLite's ROUND in fast_import
+                arr = pc.round(pc.multiply(arr, COORD_SCALE), round_mode="half_towards_infinity").cast(pa.int64())
+            elif col in NUM_COLS_INT:
+                arr = arr.cast(pa.int64(), safe=False)
+            columns.append(arr.to_pylist())
+        yield from zip(*columns)
+
+
+def insert_batched(cur, rows, insert_sql, insert_sql_batch):
+    """Insert rows BATCH_ROWS at a time with one multi-row statement, then the remainder."""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, BATCH_ROWS))
+        if len(batch) < BATCH_ROWS:
+            cur.executemany(insert_sql, batch)
+            return
+        cur.execute(insert_sql_batch, list(itertools.chain.from_iterable(batch)))
+
+
+def drop_indexes(cur, table: str) -> List[str]:
+    """Drop the table's secondary indexes and return their DDL for rebuilding."""
+    cur.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,),
+    )
+    indexes = cur.fetchall()
+    for name, _ in indexes:
+        cur.execute(f'DROP INDEX "{name}"')
+    return [sql for _, sql in indexes]
+
+
+def unsafe_load_pragmas(conn):
+    if conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+        print("SQLITE_UNSAFE_LOAD=1: keeping WAL, fsync disabled")
+        return UNSAFE_WAL_LOAD_PRAGMAS
+    print("SQLITE_UNSAFE_LOAD=1: journaling in memory, fsync disabled")
+    return UNSAFE_LOAD_PRAGMAS
+
+
+def load_rows(conn, args):
+    """Parse the CSV in Python and insert it with batched multi-row INSERTs."""
+    placeholders = "(" + ",".join(["?"] * len(EXPECTED_COLUMNS)) + ")"
+    insert_sql = f"INSERT INTO {args.table} (" + ",".join(EXPECTED_COLUMNS) + ") VALUES "
+    insert_sql_batch = insert_sql + ",".join([placeholders] * BATCH_ROWS)
+    insert_sql += placeholders
+
+    conn.executescript(LOAD_PRAGMAS)
+    if os.getenv("SQLITE_UNSAFE_LOAD") == "1":
+        conn.executescript(unsafe_load_pragmas(conn))
+    cur = conn.cursor()
+    cur.execute("BEGIN")
+    if args.truncate:
+        print(f"Truncating table {args.table} ...")
+        cur.execute(f"DELETE FROM {args.table};")
+
+    # Building indexes once after the load beats updating them per row.
+    # DDL is transactional in SQLite, so a failed load rolls the drops back too.
+    index_ddl = drop_indexes(cur, args.table)
+
+    print(f"Loading {args.csv} into {args.table} ...")
+    insert_batched(cur, iter_rows(args.csv), insert_sql, insert_sql_batch)
+
+    print(f"Rebuilding {len(index_ddl)} indexes ...")
+    for ddl in index_ddl:
+        cur.execute(ddl)
+    # Refresh planner statistics for the new data
+    cur.execute(f"ANALYZE {args.table}")
+    cur.execute("COMMIT")
+
+
+def fast_import(conn, args):
+    """Load the CSV with the sqlite3 shell's `.import`, skipping Python row handling.
+
+    The shell imports into a TEXT staging table; the INSERT ... SELECT turns
+    blanks into NULL and column affinity converts the numbers, as load_rows does.
+    """
+    sqlite3_cli = shutil.which("sqlite3")
+    if sqlite3_cli is None:
+        raise RuntimeError("--fast-import needs the sqlite3 command-line shell on PATH")
+
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (args.table,),
+    )
+    indexes = cur.fetchall()
+    cur.close()
+
+    cols = ",".join(EXPECTED_COLUMNS)
+    select = ",".join(
+        f"CAST(ROUND(NULLIF(TRIM({c}), '') * {COORD_SCALE}) AS INTEGER)" if c in COORD_COLS else f"NULLIF(TRIM({c}), '')"
+        for c in EXPECTED_COLUMNS
+    )
+    script = [".bail on", LOAD_PRAGMAS]
+    if os.getenv("SQLITE_UNSAFE_LOAD") == "1":
+        script.append(unsafe_load_pragmas(conn))
+    script.append("BEGIN;")
+    if args.truncate:
+        print(f"Truncating table {args.table} ...")
+        script.append(f"DELETE FROM {args.table};")
+    script += [f'DROP INDEX "{name}";' for name, _ in indexes]
+    script += [
+        "DROP TABLE IF EXISTS temp.csv_import;",
+        f'.import --csv --schema temp "{args.csv}" csv_import',
+        f"INSERT INTO {args.table} ({cols}) SELECT {select} FROM temp.csv_import;",
+        "DROP TABLE temp.csv_import;",
+    ]
+    script += [f"{sql};" for _, sql in indexes]
+    script += [f"ANALYZE {args.table};", "COMMIT;"]
+
+    print(f"Importing {args.csv} into {args.table} with {sqlite3_cli} ...")
+    result = subprocess.run([sqlite3_cli, args.db], input="\n".join(script) + "\n",
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"sqlite3 exited with status {result.returncode}")
+
+
+def export_parquet(conn, table: str, path: str):
+    """Write the whole table to zstd Parquet, replacing any previous export atomically."""
+    tmp_path = path + ".tmp"
+    cur = conn.cursor()
+    # Stamp the export with the table state; database.get_duck() ignores it once they differ
+    row_count, max_id = cur.execute(f"SELECT COUNT(*), MAX(id) FROM {table}").fetchone()
+    schema = PARQUET_SCHEMA.with_metadata({"sqlite_rows": str(row_count), "sqlite_max_id": str(max_id)})
+    select = ",".join(f"{c} / {COORD_SCALE}.0" if c in COORD_COLS else c for c in PARQUET_SCHEMA.names)
+    cur.execute(f"SELECT {select} FROM {table} ORDER BY id")
+    with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+        while True:
+            rows = cur.fetchmany(PARQUET_ROW_GROUP)
+            if not rows:
+                break
+            arrays = [pa.array(col, type=field.type) for col, field in zip(zip(*rows), PARQUET_SCHEMA)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema), row_group_size=PARQUET_ROW_GROUP)
+    os.replace(tmp_path, path)
+
+
 def main():
     args = parse_args()
 
@@ -73,53 +294,27 @@ def main():
         validate_header(found, EXPECTED_COLUMNS)
         print("Header validation: OK")
 
-    insert_sql = (
-        f"INSERT INTO {args.table} (" + ",".join(EXPECTED_COLUMNS) + ") "
-        "VALUES (" + ",".join(["?"] * len(EXPECTED_COLUMNS)) + ")"
-    )
-
     try:
-        with sqlite3.connect(args.db) as conn:
-            cur = conn.cursor()
-            if args.truncate:
-                print(f"Truncating table {args.table} ...")
-                cur.execute(f"DELETE FROM {args.table};")
-                conn.commit()
-
-            print(f"Loading {args.csv} into {args.table} ...")
-            with open(args.csv, "r", encoding="utf-8", newline="") as f:
-                reader = csv.DictReader(f)
-                rows = []
-                num_cols_float = {"pickup_lat","pickup_lon","dropoff_lat","dropoff_lon","trip_distance_km","fare_amount","tip_amount","avg_speed_kmh","fare_per_km","haversine_km"}
-                num_cols_int = {"trip_duration_sec","passenger_count","pickup_hour","weekday","is_weekend"}
-                for row in reader:
-                    cleaned = []
-                    for col in EXPECTED_COLUMNS:
-                        val = row.get(col, "")
-                        if isinstance(val, str):
-                            val = val.strip()
-                        if val == "":
-                            cleaned.append(None)
-                            continue
-                        if col in num_cols_float:
-                            try:
-                                cleaned.append(float(val))
-                            except ValueError:
-                                cleaned.append(None)
-                        elif col in num_cols_int:
-                            try:
-                                cleaned.append(int(float(val)))
-                            except ValueError:
-                                cleaned.append(None)
-                        else:
-                            cleaned.append(val)
-                    rows.append(tuple(cleaned))
-                cur.executemany(insert_sql, rows)
-            conn.commit()
+        # Autocommit mode so the whole load runs in one explicit transaction
+        with sqlite3.connect(args.db, isolation_level=None) as conn:
+            if args.fast_import:
+                fast_import(conn, args)
+            else:
+                load_rows(conn, args)
 
+            cur = conn.cursor()
             cur.execute(f"SELECT COUNT(*) FROM {args.table};")
             total = cur.fetchone()[0]
             print(f"Load complete. Row count: {total}")
+
+            if not args.no_parquet:
+                # Exported from the table, not the CSV, so appends are included
+                print(f"Exporting {args.table} to {args.parquet} ...")
+                export_parquet(conn, args.table, args.parquet)
+            elif os.path.exists(args.parquet):
+                # An older export no longer matches the table
+                print(f"Removing stale export {args.parquet}")
+                os.remove(args.parquet)
     except Exception as e:
         print("ERROR during load:", e, file=sys.stderr)
         sys.exit(2)
@@ -4,10 +4,13 @@ CREATE TABLE trips (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   pickup_datetime TEXT NOT NULL,
   dropoff_datetime TEXT NOT NULL,
-  pickup_lat REAL,
-  pickup_lon REAL,
-  dropoff_lat REAL,
-  dropoff_lon REAL,
+  -- Coordinates in integer micro-degrees (degrees * 1e6): 4-byte integers
+  -- instead of 8-byte REALs; the API divides by 1e6 on read. Precision is
+  -- therefore 1e-6 degrees: finer digits in the CSV are rounded away on load.
+  pickup_lat INTEGER,
+  pickup_lon INTEGER,
+  dropoff_lat INTEGER,
+  dropoff_lon INTEGER,
   trip_distance_km REAL CHECK (trip_distance_km >= 0),
   trip_duration_sec INTEGER CHECK (trip_duration_sec > 0),
   fare_amount REAL CHECK (fare_amount >= 0),
@@ -23,9 +26,14 @@ CREATE TABLE trips (
   created_at TEXT DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE INDEX idx_trips_pickup_time ON trips (pickup_datetime);
+-- Serves /api/trips: (pickup_datetime, id) matches its ORDER BY and keyset
+-- cursor, and trip_distance_km lets distance filters run on index entries
+-- before any table row is read.
+CREATE INDEX idx_trips_pickup_dist ON trips (pickup_datetime, id, trip_distance_km);
 CREATE INDEX idx_trips_dropoff_time ON trips (dropoff_datetime);
 CREATE INDEX idx_trips_pickup_loc ON trips (pickup_lat, pickup_lon);
 CREATE INDEX idx_trips_dropoff_loc ON trips (dropoff_lat, dropoff_lon);
-CREATE INDEX idx_trips_speed ON trips (avg_speed_kmh);
+-- Also covers the /api/summary aggregate (COUNT + AVG of both columns),
+-- so SQLite scans this narrow index instead of the full table.
+CREATE INDEX idx_trips_speed_fare ON trips (avg_speed_kmh, fare_per_km);
 CREATE INDEX idx_trips_fare ON trips (fare_amount);